@@ -1,17 +1,40 @@
 import json
 import os
-import logging
+import threading
 import time
-from flask import Flask, render_template, request, redirect, url_for, flash
+from concurrent.futures import ThreadPoolExecutor
+import grpc
+from flask import Flask, Response, request, redirect, url_for, flash, session
 from opentelemetry import trace
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.flask import FlaskInstrumentor
 from opentelemetry.trace.status import StatusCode
 from opentelemetry.trace import SpanKind
 
+# JSON helpers: orjson does C-level encode/decode and is several times faster
+# than the stdlib json module, which runs on every request here (log records
+# and the course file). Fall back to stdlib json if orjson isn't installed.
+try:
+    import orjson
+
+    json_dumps = orjson.dumps  # compact bytes
+
+    def json_dumps_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)  # bytes
+
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+    def json_dumps_pretty(obj):
+        return json.dumps(obj, indent=4).encode()
+
+    json_loads = json.loads
+
 # Flask App Initialization
 app = Flask(__name__)
 app.secret_key = 'secret'
@@ -22,211 +45,281 @@ resource = Resource.create({"service.name": "course-catalog-service"})
 trace.set_tracer_provider(TracerProvider(resource=resource))
 tracer = trace.get_tracer(__name__)
 
-# Jaeger Exporter Setup
-jaeger_exporter = JaegerExporter(
-    agent_host_name="localhost",
-    agent_port=6831,
+# OTLP Exporter Setup: gRPC over TCP, so large span batches aren't subject
+# to the 64KB UDP packet limit of the old Jaeger Thrift agent exporter.
+# Gzip keeps export bandwidth down; the CPU cost is amortized by batching.
+otlp_exporter = OTLPSpanExporter(
+    endpoint="localhost:4317",
+    insecure=True,
+    compression=grpc.Compression.Gzip,
+)
+
+class ConcurrentSpanExporter(SpanExporter):
+    """Allow several export batches in flight at once.
+
+    The batch processor's worker calls export() synchronously, so a slow
+    collector round-trip stalls the queue. Handing batches to a small thread
+    pool hides that latency while keeping backpressure via the pool size.
+    """
+    def __init__(self, exporter, max_concurrent_exports=4):
+        self._exporter = exporter
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_exports)
+        self._pending_lock = threading.Lock()
+        self._pending = []
+
+    def export(self, spans):
+        spans = list(spans)
+        try:
+            future = self._executor.submit(self._exporter.export, spans)
+        except RuntimeError:
+            # concurrent.futures shuts its pools down before the atexit hook
+            # where the SDK drains the batch queue, so the final batch always
+            # finds a dead executor — export it synchronously instead of
+            # dropping it.
+            return self._exporter.export(spans)
+        with self._pending_lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis=30000):
+        # Wait for batches already handed to the pool, then flush the wrapped
+        # exporter with whatever time is left.
+        deadline = time.monotonic() + timeout_millis / 1000.0
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                future.result(timeout=remaining)
+            except Exception:
+                pass  # export failures are the exporter's problem, not flush's
+        remaining_millis = int((deadline - time.monotonic()) * 1000)
+        if remaining_millis <= 0:
+            return False
+        return self._exporter.force_flush(remaining_millis)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._exporter.shutdown()
+# Tuned batch parameters: a deeper queue absorbs traffic bursts without
+# dropping spans, and larger batches amortize export overhead. The worker
+# wakes early once the queue is half full, so the queue is sized well above
+# expected peak spans per second.
+span_processor = BatchSpanProcessor(
+    ConcurrentSpanExporter(otlp_exporter),
+    max_queue_size=4096,
+    max_export_batch_size=512,
+    schedule_delay_millis=2000,
+    export_timeout_millis=10000,
 )
-span_processor = BatchSpanProcessor(jaeger_exporter)
 trace.get_tracer_provider().add_span_processor(span_processor)
 
 # Instrument the Flask app for OpenTelemetry
 FlaskInstrumentor().instrument_app(app)
 
+# Template Setup: load each template object once and render it directly,
+# skipping the per-render environment lookup and the template-file stat that
+# auto-reload performs. The template set is small and fixed.
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+_tpl_index = app.jinja_env.get_template('index.html')
+_tpl_catalog = app.jinja_env.get_template('course_catalog.html')
+_tpl_add_course = app.jinja_env.get_template('add_course.html')
+_tpl_course_details = app.jinja_env.get_template('course_details.html')
+
 # Structured Logging Setup
+# The log file is JSON Lines (one JSON object per line). Records are appended
+# straight to an O_APPEND file descriptor: the kernel serializes appends, so
+# no lock is needed across threads, and each event is one write() call with
+# none of the per-record locking and formatting layers of the logging module.
 log_file = "logoutput.json"
+_LOG_FD = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
 
-# Ensure log file exists and initialize it as an empty JSON array if needed
-if not os.path.exists(log_file):
-    with open(log_file, 'w') as file:
-        file.write("[]")  # Initialize as an empty JSON array
-
-class JsonFileHandler(logging.FileHandler):
-    """Custom log handler to append JSON entries to a file."""
-    def emit(self, record):
-        log_entry = self.format(record)
-        with open(self.baseFilename, 'r+') as file:
-            data = json.load(file)  # Read existing JSON array
-            data.append(json.loads(log_entry))  # Add new log entry
-            file.seek(0)  # Move to the beginning of the file
-            json.dump(data, file, indent=4)  # Write updated JSON array
-
-# Configure the logger
-json_handler = JsonFileHandler(log_file)
-json_handler.setFormatter(logging.Formatter('%(message)s'))
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(json_handler)
-logger.propagate = False  # Prevent logging to other handlers (e.g., terminal)
+def log_event(data, level="INFO"):
+    """Append one JSON log line with a timestamp and level."""
+    entry = {"ts": time.time(), "level": level}
+    entry.update(data)
+    os.write(_LOG_FD, json_dumps(entry) + b"\n")
 
 # Utility Functions
+# In-memory cache of the parsed catalog, invalidated by file mtime. Reads are
+# a dict lookup at steady state instead of re-parsing the JSON file per
+# request; "by_code" gives O(1) course lookup by course code.
+_courses_lock = threading.Lock()
+_courses_cache = {"mtime": 0, "version": 0, "data": [], "by_code": {}, "json_bytes": b"[]"}
+
+# Rendered catalog page, reused until the course list version moves on. The
+# version counter is bumped on every reload or mutation, so serving the page
+# needs no stat or render at steady state.
+_catalog_html_cache = {"version": -1, "html": None}
+
+def _atomic_write_json(path, obj):
+    """Write obj as JSON via a temp file + rename so readers never see a
+    partial file, even if the process dies mid-write."""
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as file:
+        file.write(json_dumps_pretty(obj))
+    os.replace(tmp, path)
+
+def _update_courses_cache(courses, mtime):
+    _courses_cache["mtime"] = mtime
+    _courses_cache["version"] += 1
+    _courses_cache["data"] = courses
+    _courses_cache["by_code"] = {course['code']: course for course in courses}
+    _courses_cache["json_bytes"] = json_dumps(courses)
+
 def load_courses():
-    """Load courses from the JSON file."""
-    if not os.path.exists(COURSE_FILE):
-        return []  # Return an empty list if the file doesn't exist
-    with open(COURSE_FILE, 'r') as file:
-        return json.load(file)
+    """Load courses from the JSON file, served from cache while unchanged."""
+    with _courses_lock:
+        mtime = os.stat(COURSE_FILE).st_mtime_ns
+        if mtime != _courses_cache["mtime"]:
+            with open(COURSE_FILE, 'rb') as file:
+                _update_courses_cache(json_loads(file.read()), mtime)
+        return _courses_cache["data"]
+
+def get_course(code):
+    """Look up a single course by code, or None if it doesn't exist."""
+    load_courses()  # Refresh the cache if the file changed
+    return _courses_cache["by_code"].get(code)
 
 def save_courses(data):
-    """Save new course data to the JSON file."""
-    courses = load_courses()  # Load existing courses
-    courses.append(data)  # Append the new course
-    with open(COURSE_FILE, 'w') as file:
-        json.dump(courses, file, indent=4)
+    """Append a new course to the cached list and write the file once."""
+    load_courses()  # Refresh the cache if the file changed on disk
+    with _courses_lock:
+        courses = _courses_cache["data"]
+        courses.append(data)
+        _courses_cache["by_code"][data['code']] = data
+        _atomic_write_json(COURSE_FILE, courses)
+        _courses_cache["mtime"] = os.stat(COURSE_FILE).st_mtime_ns
+        _courses_cache["version"] += 1
+        _courses_cache["json_bytes"] = json_dumps(courses)
+
+# Create the catalog file once at startup: the app owns it and nothing
+# deletes it while running, so per-request reads can skip the existence check.
+if not os.path.exists(COURSE_FILE):
+    _atomic_write_json(COURSE_FILE, [])
+    log_event({"event": "catalog-file-created", "path": COURSE_FILE})
+
+# Form fields for a course; the first three are required.
+COURSE_FIELDS = ('code', 'name', 'instructor', 'semester', 'schedule',
+                 'classroom', 'prerequisites', 'grading')
+REQUIRED_FIELDS = ('code', 'name', 'instructor')
 
 # Routes
 @app.route('/')
 def index():
-    start_time = time.time()  # Start time for processing
-    with tracer.start_as_current_span("index-page", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        
-        logger.info(json.dumps({"event": "index-page", "method": request.method, "url": request.url, "processing_time": processing_time}))
-        return render_template('index.html')
+    log_event({"event": "index-page", "method": request.method, "url": request.url})
+    return _tpl_index.render()
 
 @app.route('/catalog')
 def course_catalog():
-    start_time = time.time()  # Start time for processing
-    with tracer.start_as_current_span("course-catalog", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        span.set_attribute("user.ip", request.remote_addr)
-        
-        courses = load_courses()
-        span.set_attribute("course.count", len(courses))
-
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        
-        logger.info(json.dumps({"event": "catalog-page", "method": request.method, "course_count": len(courses), "processing_time": processing_time}))
-        return render_template('course_catalog.html', courses=courses)
+    courses = load_courses()
+    trace.get_current_span().set_attributes({"user.ip": request.remote_addr, "course.count": len(courses)})
+
+    log_event({"event": "catalog-page", "method": request.method, "course_count": len(courses)})
+
+    # Flashed messages are per-request content, so those renders skip the
+    # page cache; everyone else gets the stored HTML until the catalog
+    # version moves on.
+    if session.get('_flashes'):
+        return _tpl_catalog.render(courses=courses)
+    # Capture the version before rendering: if a mutation lands mid-render,
+    # storing the pre-render version just forces a re-render next request
+    # instead of pinning stale HTML to the post-mutation version.
+    version = _courses_cache["version"]
+    if _catalog_html_cache["version"] != version:
+        _catalog_html_cache["html"] = _tpl_catalog.render(courses=courses)
+        _catalog_html_cache["version"] = version
+    return _catalog_html_cache["html"]
+
+@app.route('/catalog.json')
+def course_catalog_json():
+    load_courses()  # Refresh the cache if the file changed on disk
+    log_event({"event": "catalog-json", "method": request.method})
+    # Serialized once per mutation in the course cache — no encode work here.
+    return Response(_courses_cache["json_bytes"], mimetype='application/json')
 
 @app.route('/add_course', methods=['GET', 'POST'])
 def add_course():
-    start_time = time.time()  # Start time for processing
-    with tracer.start_as_current_span("add-course-submit", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        
-        if request.method == 'POST':
-            course = {
-                'code': request.form['code'].strip(),
-                'name': request.form['name'].strip(),
-                'instructor': request.form['instructor'].strip(),
-                'semester': request.form['semester'].strip(),
-                'schedule': request.form['schedule'].strip(),
-                'classroom': request.form['classroom'].strip(),
-                'prerequisites': request.form['prerequisites'].strip(),
-                'grading': request.form['grading'].strip()
-            }
-
-            # Validate required fields
-            missing_fields = [field for field in ['code', 'name', 'instructor'] if not course[field]]
-            if missing_fields:
-                error_message = f"The following required fields are missing: {', '.join(missing_fields)}"
-                logger.warning(json.dumps({"event": "add-course-error", "missing_fields": missing_fields}))
-                
-                # Add error details to Jaeger span
-                span.set_status(StatusCode.ERROR, error_message)
-                span.record_exception(ValueError(error_message))
-                span.set_attribute("error.missing_fields", ', '.join(missing_fields))
-                
-                flash(error_message, "error")
-                return render_template('add_course.html')
-
-            save_courses(course)
-            span.set_attribute("course.code", course['code'])
-            span.set_attribute("course.name", course['name'])
-
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            span.set_attribute("processing_time", processing_time)  # Add processing time to span
-            
-            logger.info(json.dumps({"event": "course-added", "course_code": course['code'], "course_name": course['name'], "processing_time": processing_time}))
-            return redirect(url_for('course_catalog'))
-        
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        logger.info(json.dumps({"event": "add-course-page", "method": request.method, "url": request.url, "processing_time": processing_time}))
-        return render_template('add_course.html')
+    if request.method == 'POST':
+        form = request.form
+        course = {field: form.get(field, '').strip() for field in COURSE_FIELDS}
+
+        # Validate required fields
+        missing_fields = [field for field in REQUIRED_FIELDS if not course[field]]
+        if missing_fields:
+            error_message = f"The following required fields are missing: {', '.join(missing_fields)}"
+            log_event({"event": "add-course-error", "missing_fields": missing_fields}, level="WARNING")
+
+            # Add error details to the request span
+            span = trace.get_current_span()
+            span.set_status(StatusCode.ERROR, error_message)
+            span.record_exception(ValueError(error_message))
+            span.set_attribute("error.missing_fields", ', '.join(missing_fields))
+
+            flash(error_message, "error")
+            return _tpl_add_course.render()
+
+        save_courses(course)
+        trace.get_current_span().set_attributes({"course.code": course['code'], "course.name": course['name']})
+
+        log_event({"event": "course-added", "course_code": course['code'], "course_name": course['name']})
+        return redirect(url_for('course_catalog'))
+
+    log_event({"event": "add-course-page", "method": request.method, "url": request.url})
+    return _tpl_add_course.render()
 
 @app.route('/course/<code>')
 def course_details(code):
-    start_time = time.time()  # Start time for processing
-    with tracer.start_as_current_span("course-details", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        span.set_attribute("course.code", code)
-        
-        courses = load_courses()
-        course = next((course for course in courses if course['code'] == code), None)
-        if not course:
-            flash(f"No course found with code '{code}'.", "error")
-            logger.warning(json.dumps({"event": "course-not-found", "course_code": code}))
-            return redirect(url_for('course_catalog'))
-        
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        
-        logger.info(json.dumps({"event": "course-details-viewed", "course_code": code, "processing_time": processing_time}))
-        return render_template('course_details.html', course=course)
+    trace.get_current_span().set_attribute("course.code", code)
+
+    course = get_course(code)
+    if not course:
+        flash(f"No course found with code '{code}'.", "error")
+        log_event({"event": "course-not-found", "course_code": code}, level="WARNING")
+        return redirect(url_for('course_catalog'))
+
+    log_event({"event": "course-details-viewed", "course_code": code})
+    return _tpl_course_details.render(course=course)
 
 @app.route('/delete_course/<code>', methods=['POST'])
 def delete_course(code):
-    start_time = time.time()  # Start time for processing
-    with tracer.start_as_current_span("delete-course", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        span.set_attribute("course.code", code)
-
-        # Load existing courses
-        courses = load_courses()
+    trace.get_current_span().set_attribute("course.code", code)
 
-        # Find the course to delete
-        course_to_delete = next((course for course in courses if course['code'] == code), None)
+    load_courses()  # Refresh the cache if the file changed on disk
 
+    # Do the whole read-modify-write under the lock so a concurrent
+    # add_course can't be lost between the scan and the rewrite.
+    with _courses_lock:
+        course_to_delete = _courses_cache["by_code"].pop(code, None)
         if course_to_delete:
-            # Remove the course from the list
-            courses = [course for course in courses if course['code'] != code]
-
-            # Save updated courses back to JSON
-            with open(COURSE_FILE, 'w') as file:
-                json.dump(courses, file, indent=4)
-
-            logger.info(json.dumps({"event": "course-deleted", "course_code": code}))
-            flash(f"Course with code {code} has been deleted successfully.", "success")
-        else:
-            flash(f"No course found with code '{code}'.", "error")
-
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        
-        logger.info(json.dumps({"event": "course-deleted", "course_code": code, "processing_time": processing_time}))
-        return redirect(url_for('course_catalog'))
+            courses = [course for course in _courses_cache["data"] if course['code'] != code]
+            _atomic_write_json(COURSE_FILE, courses)
+            _courses_cache["data"] = courses
+            _courses_cache["mtime"] = os.stat(COURSE_FILE).st_mtime_ns
+            _courses_cache["version"] += 1
+            _courses_cache["json_bytes"] = json_dumps(courses)
+
+    if course_to_delete:
+        log_event({"event": "course-deleted", "course_code": code})
+        flash(f"Course with code {code} has been deleted successfully.", "success")
+    else:
+        flash(f"No course found with code '{code}'.", "error")
+
+    return redirect(url_for('course_catalog'))
 
 @app.route("/manual-trace")
 def manual_trace():
-    start_time = time.time()  # Start time for processing
     with tracer.start_as_current_span("manual-span", kind=SpanKind.SERVER) as span:
-        span.set_attribute("http.method", request.method)
-        span.set_attribute("http.url", request.url)
-        
-
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        span.set_attribute("processing_time", processing_time)  # Add processing time to span
-        
-        logger.info(json.dumps({"event": "manual-trace", "method": request.method, "url": request.url, "processing_time": processing_time}))
+        span.set_attributes({"http.method": request.method, "http.url": request.url})
+
+        log_event({"event": "manual-trace", "method": request.method, "url": request.url})
         return "Manual trace finished"
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Dev server only; run gunicorn for real traffic (see README). The
+    # debugger/reloader stay off unless explicitly requested via FLASK_DEBUG.
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')